@@ -0,0 +1,169 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+import utils
+
+# --- 定数設定 ---
+# 保存先
+INDEX_PATH = 'analog_index.pkl'
+
+# 予測対象
+TARGET_COLS = {'max': 'tokyo_temp_max', 'min': 'tokyo_temp_min'}
+
+# --- クラス定義 ---
+
+class AnalogForecaster:
+    """
+    類似日（アナログ）予報
+    直近7日間の状態が今日と似ている過去の日を KD-tree で探し、その翌日の実績を距離で重み付けして混ぜる
+    """
+
+    def __init__(self, k=10, rebuild_threshold=100):
+        self.k = k
+        # 追加データがこの件数を超えたら木を作り直す
+        self.rebuild_threshold = rebuild_threshold
+        self.features = []
+        self.mean = None
+        self.std = None
+        self.tree = None
+        self.X = None          # 木に入っている標準化済みベクトル
+        self.Y = None          # 対応する実績 (列は TARGET_COLS の順)
+        self.dates = None
+        self.pending_X = []    # まだ木に入っていない追加分
+        self.pending_Y = []
+        self.pending_dates = []
+        self.data_hash = None  # 索引に入っている元データの指紋（書き換えの検出用）
+
+    def _standardize(self, X):
+        Z = (np.asarray(X, dtype=float) - self.mean) / self.std
+        # 欠損は平均 (=0) 扱い
+        return np.nan_to_num(Z, nan=0.0)
+
+    def fit(self, X, Y, dates, features):
+        """ラグベクトル X と実績 Y から索引を作る"""
+        X = np.asarray(X, dtype=float)
+        self.features = list(features)
+        self.mean = np.nanmean(X, axis=0)
+        self.std = np.nanstd(X, axis=0)
+        self.std[self.std == 0] = 1.0
+        self.X = self._standardize(X)
+        self.Y = np.asarray(Y, dtype=float)
+        self.dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+        self.pending_X, self.pending_Y, self.pending_dates = [], [], []
+        self.tree = KDTree(self.X)
+        return self
+
+    @property
+    def last_date(self):
+        if self.pending_dates:
+            return max(self.pending_dates)
+        return self.dates.max()
+
+    def add(self, X, Y, dates):
+        """
+        新しい日を追加する
+        標準化のパラメータは固定のまま、件数が溜まったら木だけを作り直す
+        """
+        self.pending_X.extend(self._standardize(X))
+        self.pending_Y.extend(np.asarray(Y, dtype=float))
+        self.pending_dates.extend(pd.to_datetime(pd.Series(dates)))
+
+        if len(self.pending_X) >= self.rebuild_threshold:
+            self.X = np.vstack([self.X, np.array(self.pending_X)])
+            self.Y = np.vstack([self.Y, np.array(self.pending_Y)])
+            self.dates = pd.concat([self.dates, pd.Series(self.pending_dates)], ignore_index=True)
+            self.pending_X, self.pending_Y, self.pending_dates = [], [], []
+            self.tree = KDTree(self.X)
+
+    def neighbors(self, x):
+        """類似日を近い順に返す: (距離, 実績, 日付)"""
+        z = self._standardize([x])
+        k = min(self.k, len(self.X))
+        dist, idx = self.tree.query(z, k=k)
+        dist, Y, dates = dist[0], self.Y[idx[0]], list(self.dates.iloc[idx[0]])
+
+        # 追加分は件数が少ないので総当たりで比較
+        if self.pending_X:
+            p_dist = np.linalg.norm(np.array(self.pending_X) - z, axis=1)
+            dist = np.concatenate([dist, p_dist])
+            Y = np.vstack([Y, np.array(self.pending_Y)])
+            dates = dates + list(self.pending_dates)
+            order = np.argsort(dist)[:self.k]
+            dist, Y, dates = dist[order], Y[order], [dates[i] for i in order]
+        return dist, Y, dates
+
+    def predict(self, x):
+        """類似日の実績を距離の逆数で重み付け平均する"""
+        dist, Y, dates = self.neighbors(x)
+        weights = 1.0 / (dist + 1e-6)
+        blended = weights @ Y / weights.sum()
+        preds = {key: blended[i] for i, key in enumerate(TARGET_COLS)}
+        return preds, dates
+
+    def save(self, path=INDEX_PATH):
+        """複数のワーカーが同時に保存しても壊れないよう、一時ファイルに書いてから置き換える"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path=INDEX_PATH):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+# --- 関数定義 ---
+
+def build_analog_dataset(df_all):
+    """データベースからラグベクトル・実績・日付を作る"""
+    df_all = df_all.copy()
+    df_all['date'] = pd.to_datetime(df_all['date'])
+    df_all, valid_features = utils.build_lag_features(df_all)
+    df_ml = df_all.dropna(subset=valid_features + list(TARGET_COLS.values()))
+    return (
+        df_ml[valid_features].to_numpy(),
+        df_ml[list(TARGET_COLS.values())].to_numpy(),
+        df_ml['date'],
+        valid_features
+    )
+
+def dataset_hash(X, Y, dates):
+    """ラグベクトル・実績・日付から指紋を作る（既存の行が書き換えられたかの判定に使う）"""
+    h = hashlib.sha1()
+    for arr in [np.asarray(X, dtype=float), np.asarray(Y, dtype=float),
+                pd.to_datetime(pd.Series(dates)).to_numpy().astype('int64')]:
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+def load_or_build(df_all, path=INDEX_PATH, k=10):
+    """
+    保存済みの索引を読み込み、データベースに増えた日だけを追加する
+    索引がない・壊れている・列構成が変わった・既存の行が書き換えられた場合は作り直す
+    """
+    X, Y, dates, features = build_analog_dataset(df_all)
+
+    model = None
+    if os.path.exists(path):
+        try:
+            model = AnalogForecaster.load(path)
+        except Exception:
+            model = None # 読めない索引は作り直す
+
+    if model is not None and model.features == features:
+        old = (dates <= model.last_date).to_numpy()
+        if getattr(model, 'data_hash', None) == dataset_hash(X[old], Y[old], dates[old]):
+            new = ~old
+            if new.any():
+                model.add(X[new], Y[new], dates[new])
+                model.data_hash = dataset_hash(X, Y, dates)
+                model.save(path)
+            return model
+
+    model = AnalogForecaster(k=k).fit(X, Y, dates, features)
+    model.data_hash = dataset_hash(X, Y, dates)
+    model.save(path)
+    return model
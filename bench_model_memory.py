@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+import model_store
+
+# --- 設定 ---
+# 同じホストで動かすワーカー数
+N_WORKERS = 4
+BENCH_MODEL_DIR = 'smart_model_bench'
+
+# --- 関数定義 ---
+
+def read_memory():
+    """
+    このプロセスのメモリ使用量 (MB)
+    RSS: 共有ページも丸ごと数える / PSS: 共有ページをプロセス数で割って数える
+    """
+    mem = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS', 'RssAnon', 'RssFile')):
+                key, val = line.split(':')
+                mem[key] = int(val.split()[0]) / 1024
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                mem['Pss'] = int(line.split()[1]) / 1024
+    return mem
+
+def worker(mode, barrier, queue):
+    start = time.time()
+    if mode == 'train':
+        # 従来: 各ワーカーがそれぞれ学習してメモリに持つ
+        model, valid_features, _, _ = model_store.train_smart_model()
+    else:
+        # 新方式: 保存済みの配列をメモリマップで共有
+        model, valid_features, _, _ = model_store.load_models(BENCH_MODEL_DIR)
+    # 予測を1回行い、実際に使うページを読み込ませる
+    X = np.zeros((1, len(valid_features)))
+    model.predict(pd.DataFrame(X, columns=valid_features))
+    load_time = time.time() - start
+
+    # 全ワーカーがモデルを持った状態で測る
+    barrier.wait()
+    mem = read_memory()
+    queue.put({'mode': mode, 'pid': os.getpid(), 'load_sec': load_time, **mem})
+    barrier.wait()
+
+def run(mode):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(N_WORKERS)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, barrier, queue)) for _ in range(N_WORKERS)]
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+# --- メイン処理 ---
+if __name__ == '__main__':
+    if not sys.platform.startswith('linux'):
+        print("⚠️ /proc を使うため Linux でのみ計測できます")
+        sys.exit(1)
+
+    # 予測結果が sklearn と一致することを確認してから保存
+    model, valid_features, targets, stations = model_store.train_smart_model()
+    model_store.save_models(model, valid_features, targets, stations, BENCH_MODEL_DIR)
+    flat_model, _, _, _ = model_store.load_models(BENCH_MODEL_DIR)
+    df_all = pd.read_csv(model_store.DATA_PATH)
+    df_all, _ = model_store.utils.build_lag_features(df_all)
+    X = df_all[valid_features].dropna().tail(200)
+    diff = np.abs(model.predict(X) - flat_model.predict(X)).max()
+    print(f"🔍 sklearn との最大差 {diff:.2e}")
+
+    # 欠損値(NaN)を含む入力でも同じ結果になるか（アプリでは取得できなかった項目が NaN になる）
+    rng = np.random.default_rng(0)
+    X_nan = X.mask(rng.random(X.shape) < 0.1)
+    diff_nan = np.abs(model.predict(X_nan) - flat_model.predict(X_nan)).max()
+    print(f"🔍 sklearn との最大差 (10%が欠損) {diff_nan:.2e}")
+
+    results = run('train') + run('mmap')
+    df_result = pd.DataFrame(results)
+    print(df_result.round(2).to_string(index=False))
+    print("\n📊 ワーカー平均")
+    print(df_result.groupby('mode')[['load_sec', 'VmRSS', 'RssAnon', 'RssFile', 'Pss']].mean().round(2).to_string())
+    print(f"\n(ワーカー数: {N_WORKERS}、単位: 秒 / MB)")
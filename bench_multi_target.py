@@ -0,0 +1,82 @@
+import time
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+import utils
+import model_store
+
+# --- 設定 ---
+# 比較する予測対象（項目を増やすほど、対象ごとに学習する従来方式との差が広がります）
+BENCH_TARGETS = {
+    'max': 'tokyo_temp_max',
+    'min': 'tokyo_temp_min',
+    'precip': 'tokyo_precip',
+    'sun': 'tokyo_sun'
+}
+# 最後の1年を検証用に使う
+TEST_DAYS = 365
+# 推論時間の計測回数（アプリでの1回の予報 = 1行の予測）
+N_PREDICT = 50
+
+# --- 関数定義 ---
+
+def new_forest():
+    return RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+
+def bench_per_target(X_train, Y_train, X_test, X_one):
+    """従来方式: 対象ごとに別々のモデルを学習・予測する"""
+    start = time.time()
+    models = {key: new_forest().fit(X_train, Y_train[col]) for key, col in BENCH_TARGETS.items()}
+    train_sec = time.time() - start
+
+    # アプリと同じく、メモリマップ用の FlatForest で予測する
+    models = {key: model_store.FlatForest.from_sklearn(model) for key, model in models.items()}
+
+    start = time.time()
+    for _ in range(N_PREDICT):
+        {key: model.predict(X_one) for key, model in models.items()}
+    predict_ms = (time.time() - start) / N_PREDICT * 1000
+
+    preds = {key: model.predict(X_test) for key, model in models.items()}
+    return train_sec, predict_ms, preds
+
+def bench_multi_target(X_train, Y_train, X_test, X_one):
+    """新方式: 全ての対象を1つのモデルで学習・予測する"""
+    start = time.time()
+    model = new_forest().fit(X_train, Y_train[list(BENCH_TARGETS.values())])
+    train_sec = time.time() - start
+
+    # アプリと同じく、メモリマップ用の FlatForest で予測する
+    model = model_store.FlatForest.from_sklearn(model)
+
+    start = time.time()
+    for _ in range(N_PREDICT):
+        model_store.predict_targets(model, X_one, BENCH_TARGETS)
+    predict_ms = (time.time() - start) / N_PREDICT * 1000
+
+    preds = model_store.predict_targets(model, X_test, BENCH_TARGETS)
+    return train_sec, predict_ms, preds
+
+# --- メイン処理 ---
+if __name__ == '__main__':
+    df_all = pd.read_csv(model_store.DATA_PATH)
+    df_all['date'] = pd.to_datetime(df_all['date'])
+    df_all, valid_features = utils.build_lag_features(df_all)
+    df_ml = df_all.dropna(subset=valid_features + list(BENCH_TARGETS.values()))
+
+    df_train, df_test = df_ml.iloc[:-TEST_DAYS], df_ml.iloc[-TEST_DAYS:]
+    X_train, X_test = df_train[valid_features], df_test[valid_features]
+    X_one = X_test.iloc[[-1]]
+
+    results = []
+    for name, bench in [('per_target', bench_per_target), ('multi_target', bench_multi_target)]:
+        train_sec, predict_ms, preds = bench(X_train, df_train, X_test, X_one)
+        row = {'mode': name, 'train_sec': train_sec, 'predict_ms': predict_ms}
+        for key, col in BENCH_TARGETS.items():
+            row[f'MAE_{key}'] = np.abs(preds[key] - df_test[col].to_numpy()).mean()
+        results.append(row)
+        print(f"✅ {name} 完了")
+
+    print(f"\n📊 対象 {len(BENCH_TARGETS)}項目 / 学習 {len(df_train)}日 / 検証 {len(df_test)}日")
+    print(pd.DataFrame(results).round(3).to_string(index=False))
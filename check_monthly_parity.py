@@ -0,0 +1,56 @@
+import sys
+import time
+import pandas as pd
+
+import utils
+
+# --- 設定 ---
+# 月別一括取得 (daily_s1) の値が、既存の weather_database.csv (時別値から集計) と一致するかを確認します
+SAMPLE_MONTHS = [(2015, 1), (2018, 8), (2021, 4), (2024, 11)]
+
+# 許容誤差
+# 日別値ページの最高・最低気温は毎正時以外も含めた極値のため、時別値の最大・最小より外側になります
+TOLERANCES = {
+    'temp_mean': 0.3,
+    'temp_max': 1.5,
+    'temp_min': 1.5,
+    'hum': 1.5,
+    'press': 0.3,
+    'precip': 0.5,
+    'sun': 0.2
+}
+
+# --- メイン処理 ---
+df_db = pd.read_csv('weather_database.csv')
+df_db['date'] = pd.to_datetime(df_db['date']).dt.date
+
+# weather_database.csv の *_sun は時別値の列ずれで降雪量が入っているため、日照は enhanced 版と比較する
+df_enh = pd.read_csv('weather_database_enhanced.csv')
+df_enh['date'] = pd.to_datetime(df_enh['date']).dt.date
+sun_cols = [f'{name}_sun' for name in utils.STATIONS]
+df_db = df_db.drop(columns=sun_cols).merge(df_enh[['date'] + sun_cols], on='date', how='left')
+
+results = []
+for year, month in SAMPLE_MONTHS:
+    for name, ids in utils.STATIONS.items():
+        df_month = utils.fetch_monthly_data(year, month, ids['prec_no'], ids['block_no'])
+        if df_month.empty:
+            print(f"⚠️ {name} {year}/{month}: 取得できませんでした")
+            continue
+
+        merged = df_month.merge(df_db, on='date', how='inner')
+        for col, tol in TOLERANCES.items():
+            diff = (merged[col] - merged[f'{name}_{col}']).abs()
+            results.append({
+                'station': name, 'month': f'{year}/{month:02d}', 'col': col,
+                'days': len(merged), 'max_diff': diff.max(), 'ok': bool((diff <= tol).all())
+            })
+        time.sleep(0.5) # サーバーへの優しさ
+
+df_result = pd.DataFrame(results)
+print(df_result.to_string(index=False))
+
+if df_result.empty or not df_result['ok'].all():
+    print("\n❌ 許容誤差を超える項目があります")
+    sys.exit(1)
+print("\n✅ 月別一括取得の値は既存データと一致しました")
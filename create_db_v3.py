@@ -7,12 +7,28 @@ import time
 import metpy.calc as mpcalc
 from metpy.units import units
 
+import utils
+
 # --- 設定 ---
 # 過去10年分のデータを取得します
 start_date = datetime.date(2015, 1, 1)
 # 昨日の日付まで（当日のデータはまだ確定していないため）
 end_date = datetime.date.today() - datetime.timedelta(days=1)
 
+# 取得モード
+# True: 月別の日別値ページ(daily_s1)で1か月分を1回で取得
+# False: 従来通り、1日ずつ時別値ページ(hourly_s1)を取得
+# ※ daily_s1 の読み取りは実データでの確認 (python check_monthly_parity.py) が済むまで既定では使いません
+BULK_MODE = False
+# 一括取得に失敗した月の再試行回数（それでも失敗した月は1日ずつの取得に切り替えます）
+MONTHLY_RETRIES = 3
+# 風ベクトル(wind_u, wind_v)も求めるか
+# 風は時別値ページからしか求められないため、True のときは BULK_MODE でも1日ずつ時別値を取得し、
+# 全ての列をその時別値から計算します（アプリの入力と同じ定義。月別ページは使いません）
+# False のときだけ月別ページによる一括取得が効きますが、風の列がなく、
+# 最高・最低気温も毎正時ではなく日中の極値になるため、アプリ用のCSVには使えません
+FETCH_WIND = True
+
 # 観測地点（まずは東京と甲府で確実に動かしましょう）
 STATIONS = {
     'tokyo': {'prec_no': 44, 'block_no': 47662},
@@ -106,42 +122,100 @@ def fetch_daily_data_enhanced(date, prec_no, block_no):
     except Exception:
         return None
 
+def fetch_day_record(date):
+    """1日分を全地点について時別値ページから取得する（どちらかの地点が取れなければ None）"""
+    day_record = {'date': date}
+    for name, ids in STATIONS.items():
+        # ここでデータを取得しに行きます
+        res = fetch_daily_data_enhanced(date, ids['prec_no'], ids['block_no'])
+        if not res:
+            return None # どちらかの地点でデータが取れない日は使わない
+        for key, val in res.items():
+            day_record[f"{name}_{key}"] = val
+    return day_record
+
+def fetch_month_daily(year, month):
+    """一括取得できなかった月を、従来通り1日ずつ取得する"""
+    records = []
+    date = max(datetime.date(year, month, 1), start_date)
+    while date.month == month and date <= end_date:
+        record = fetch_day_record(date)
+        if record:
+            records.append(record)
+        time.sleep(0.1)
+        date += datetime.timedelta(days=1)
+    return pd.DataFrame(records)
+
+def fetch_month_bulk(year, month):
+    """
+    1か月分を地点ごとに1リクエストで取得する（FETCH_WIND=False のときだけ使う）
+    一括取得が再試行しても失敗した場合は、その月だけ1日ずつの取得に切り替える
+    戻り値: (DataFrame, 1日ずつの取得に切り替えたか)
+    """
+    station_frames = []
+    for name, ids in STATIONS.items():
+        df_st = utils.fetch_monthly_data_with_retry(year, month, ids['prec_no'], ids['block_no'], MONTHLY_RETRIES)
+        if df_st.empty:
+            print(f"⚠️ {year}年{month}月 {name}: 一括取得に失敗したため、1日ずつ取得します")
+            # 他の月と列をそろえるため、時別値から計算した風の列は落とす
+            df_daily = fetch_month_daily(year, month)
+            return df_daily.drop(columns=[c for c in df_daily.columns if '_wind_' in c]), True
+        df_st = df_st[(df_st['date'] >= start_date) & (df_st['date'] <= end_date)].copy()
+
+        # データが欠けている日はスキップ（計算エラーを防ぐため）
+        df_st = df_st.dropna(subset=['temp_mean', 'hum'])
+        df_st = df_st.set_index('date').add_prefix(f'{name}_')
+        station_frames.append(df_st)
+
+    # どちらかの地点でデータが取れない日は使わない
+    return pd.concat(station_frames, axis=1, join='inner').reset_index(), False
+
 # --- メイン処理 ---
 all_data = []
 current_date = start_date
 
 print(f"🚀 データ作成を開始します: {start_date} ～ {end_date}")
 print("時間がかかります（約5〜10分）。コーヒーでも飲んでお待ちください☕")
+if BULK_MODE and FETCH_WIND:
+    print("ℹ️ FETCH_WIND=True のため、月別の一括取得は使わず、従来通り1日ずつ時別値から全項目を計算します")
 
 start_time = time.time()
 
-while current_date <= end_date:
-    day_record = {'date': current_date}
-    success = True
-    
-    for name, ids in STATIONS.items():
-        # ここでデータを取得しに行きます
-        res = fetch_daily_data_enhanced(current_date, ids['prec_no'], ids['block_no'])
-        if res:
-            for key, val in res.items():
-                day_record[f"{name}_{key}"] = val
+if BULK_MODE and not FETCH_WIND:
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        df_month, fell_back = fetch_month_bulk(year, month)
+        all_data.extend(df_month.to_dict('records'))
+
+        elapsed = time.time() - start_time
+        if df_month.empty:
+            print(f"⚠️ {year}年{month}月 データを取得できなかったためスキップしました - {elapsed:.0f}秒経過")
         else:
-            success = False # どちらかの地点でデータが取れない日は使わない
+            mark = "✅" if not fell_back else "✅ (1日ずつ取得)"
+            print(f"{mark} {year}年{month}月 {len(df_month)}日分... 累計{len(all_data)}日分 - {elapsed:.0f}秒経過")
+
+        # サーバー負荷軽減のための待機時間
+        time.sleep(0.5)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+else:
+    while current_date <= end_date:
+        day_record = fetch_day_record(current_date)
+        if day_record:
+            all_data.append(day_record)
     
-    if success:
-        all_data.append(day_record)
-    
-    # 進行状況を表示（50日ごと）
-    if len(all_data) % 50 == 0:
-        elapsed = time.time() - start_time
-        print(f"✅ {len(all_data)}日分完了... ({current_date}) - {elapsed:.0f}秒経過")
+        # 進行状況を表示（50日ごと）
+        if len(all_data) % 50 == 0:
+            elapsed = time.time() - start_time
+            print(f"✅ {len(all_data)}日分完了... ({current_date}) - {elapsed:.0f}秒経過")
     
-    # サーバー負荷軽減のための待機時間
-    time.sleep(0.1) 
-    current_date += datetime.timedelta(days=1)
+        # サーバー負荷軽減のための待機時間
+        time.sleep(0.1) 
+        current_date += datetime.timedelta(days=1)
 
 # CSVファイルとして保存
+# 一括取得(風なし)のCSVはアプリでは使えないため、別のファイルに保存してアプリ用のCSVを上書きしない
+output_path = 'weather_database_bulk.csv' if BULK_MODE and not FETCH_WIND else 'weather_database_enhanced.csv'
 df_final = pd.DataFrame(all_data)
-df_final.to_csv('weather_database_enhanced.csv', index=False)
+df_final.to_csv(output_path, index=False)
 
-print("✨ 完了しました！ 'weather_database_enhanced.csv' が作成されました。")
\ No newline at end of file
+print(f"✨ 完了しました！ '{output_path}' が作成されました。")
\ No newline at end of file
@@ -3,6 +3,9 @@ import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 import datetime
+import calendar
+
+import utils
 
 # --- 1. データ取得関数 ---
 def get_jma_data(prec_no, block_no, year, month, day):
@@ -29,55 +32,101 @@ stations = {
 year = 2024
 all_data_list = []
 
-print(f"🚀 {year}年のデータ収集を開始します。")
-print("※1年分の取得には約15分〜20分かかります。ゆっくりお待ちください。")
+# True: 月別の日別値ページで1か月分を1回で取得（約12回×地点数のリクエストで完了）
+# ※ daily_s1 の読み取りは実データでの確認 (python check_monthly_parity.py) が済むまで既定では使いません
+BULK_MODE = False
+BASE_COLS = ['temp_mean', 'temp_max', 'temp_min', 'hum', 'press', 'precip', 'sun']
 
-# --- 3. 2重ループで1年分回す ---
-for month in range(1, 13):
-    # 各月の日数を判定（うるう年も自動考慮）
-    if month in [4, 6, 9, 11]:
-        days_in_month = 30
-    elif month == 2:
-        days_in_month = 29 # 2024年はうるう年
-    else:
-        days_in_month = 31
+# 一括取得に失敗した月の再試行回数（それでも失敗した月は1日ずつの取得に切り替えます）
+MONTHLY_RETRIES = 3
 
-    for day in range(1, days_in_month + 1):
-        daily_combined = pd.DataFrame()
-        
-        for name, ids in stations.items():
-            df_day = get_jma_data(ids[0], ids[1], year, month, day)
-            
-            if not df_day.empty:
-                # 必要な列を数値化して集計
-                df_day.columns = ['時', '現地気圧', '海面気圧', '降水量', '気温', '露点温度', '蒸気圧', '湿度', '平均風速', '風向', '最大瞬間風速', '最大瞬間風速風向', '日照時間', '全天日射量', '降雪', '積雪', '天気']
-                for col in ['気温', '湿度', '海面気圧', '降水量', '日照時間']:
-                    df_day[col] = pd.to_numeric(df_day[col], errors='coerce')
-                
-                # 集計（平均、最高、最低、合計など）
-                summary = {
-                    f'{name}_temp_mean': df_day['気温'].mean(),
-                    f'{name}_temp_max': df_day['気温'].max(),
-                    f'{name}_temp_min': df_day['気温'].min(),
-                    f'{name}_hum': df_day['湿度'].mean(),
-                    f'{name}_press': df_day['海面気圧'].mean(),
-                    f'{name}_precip': df_day['降水量'].sum(), # 降水量合計
-                    f'{name}_sun': df_day['日照時間'].sum()     # 日照時間合計
-                }
-                
-                # 地点データを一時保存
-                temp_df = pd.DataFrame([summary])
-                if daily_combined.empty:
-                    daily_combined = temp_df
-                else:
-                    daily_combined = pd.concat([daily_combined, temp_df], axis=1)
+def fetch_day_combined(month, day):
+    """1日分を全地点について時別値ページから取得し、1行のDataFrameにまとめる"""
+    daily_combined = pd.DataFrame()
+
+    for name, ids in stations.items():
+        df_day = get_jma_data(ids[0], ids[1], year, month, day)
+    
+        if not df_day.empty:
+            # 必要な列を数値化して集計
+            df_day.columns = ['時', '現地気圧', '海面気圧', '降水量', '気温', '露点温度', '蒸気圧', '湿度', '平均風速', '風向', '最大瞬間風速', '最大瞬間風速風向', '日照時間', '全天日射量', '降雪', '積雪', '天気']
+            for col in ['気温', '湿度', '海面気圧', '降水量', '日照時間']:
+                df_day[col] = pd.to_numeric(df_day[col], errors='coerce')
         
-        if not daily_combined.empty:
-            daily_combined['date'] = datetime.date(year, month, day)
-            all_data_list.append(daily_combined)
+            # 集計（平均、最高、最低、合計など）
+            summary = {
+                f'{name}_temp_mean': df_day['気温'].mean(),
+                f'{name}_temp_max': df_day['気温'].max(),
+                f'{name}_temp_min': df_day['気温'].min(),
+                f'{name}_hum': df_day['湿度'].mean(),
+                f'{name}_press': df_day['海面気圧'].mean(),
+                f'{name}_precip': df_day['降水量'].sum(), # 降水量合計
+                f'{name}_sun': df_day['日照時間'].sum()     # 日照時間合計
+            }
         
-        print(f" ✅ {month}月{day}日 完了")
+            # 地点データを一時保存
+            temp_df = pd.DataFrame([summary])
+            if daily_combined.empty:
+                daily_combined = temp_df
+            else:
+                daily_combined = pd.concat([daily_combined, temp_df], axis=1)
+
+    if not daily_combined.empty:
+        daily_combined['date'] = datetime.date(year, month, day)
+    return daily_combined
+
+def fetch_month_bulk(month):
+    """
+    1か月分を地点ごとに1リクエストで取得する
+    再試行しても失敗した地点があれば、その月だけ1日ずつの取得に切り替える
+    戻り値: (DataFrameのリスト, 1日ずつの取得に切り替えたか)
+    """
+    station_frames = []
+    for name, ids in stations.items():
+        df_st = utils.fetch_monthly_data_with_retry(year, month, ids[0], ids[1], MONTHLY_RETRIES)
+        if df_st.empty:
+            print(f" ⚠️ {month}月 {name}: 一括取得に失敗したため、1日ずつ取得します")
+            frames = []
+            for day in range(1, calendar.monthrange(year, month)[1] + 1):
+                daily_combined = fetch_day_combined(month, day)
+                if not daily_combined.empty:
+                    frames.append(daily_combined)
+                time.sleep(0.5) # サーバーへの優しさ
+            return frames, True
+        station_frames.append(df_st.set_index('date')[BASE_COLS].add_prefix(f'{name}_'))
+
+    daily_combined = pd.concat(station_frames, axis=1).reset_index()
+    # 従来の出力と同じく date を最後の列にする
+    daily_combined = daily_combined[[c for c in daily_combined.columns if c != 'date'] + ['date']]
+    return [daily_combined], False
+
+print(f"🚀 {year}年のデータ収集を開始します。")
+if BULK_MODE:
+    print("※月ごとにまとめて取得するため、1分ほどで完了します（失敗した月は1日ずつ取得するため長くなります）。")
+else:
+    print("※1年分の取得には約15分〜20分かかります。ゆっくりお待ちください。")
+
+# --- 3. 1年分回す ---
+if BULK_MODE:
+    for month in range(1, 13):
+        frames, fell_back = fetch_month_bulk(month)
+        all_data_list.extend(frames)
+
+        if not frames:
+            print(f" ⚠️ {month}月 データを取得できなかったためスキップしました")
+        else:
+            mark = "✅" if not fell_back else "✅ (1日ずつ取得)"
+            print(f" {mark} {month}月 完了")
         time.sleep(0.5) # サーバーへの優しさ
+else:
+    for month in range(1, 13):
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            daily_combined = fetch_day_combined(month, day)
+            if not daily_combined.empty:
+                all_data_list.append(daily_combined)
+        
+            print(f" ✅ {month}月{day}日 完了")
+            time.sleep(0.5) # サーバーへの優しさ
 
 # --- 4. CSVに保存 ---
 df_final = pd.concat(all_data_list, ignore_index=True)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# --- 定数設定 ---
+# 事前集計する解像度 (細かい順)
+# 週は月曜始まりで、ラベルも週の初日にする（期間の切り出しを日付どおりにするため）
+RESOLUTIONS = {
+    'daily': {'rule': 'D'},
+    'weekly': {'rule': 'W-MON', 'label': 'left', 'closed': 'left'},
+    'monthly': {'rule': 'MS'}
+}
+
+# グラフに送る最大点数（これを超える場合は形を保ったまま間引く）
+MAX_POINTS = 400
+# 細かい解像度の点数がこの倍率を超えたときだけ、粗い解像度に切り替える
+# （それまでは細かい解像度のまま、形を保つ間引きで MAX_POINTS に減らす）
+COARSEN_FACTOR = 4
+
+# 表示用の変数名
+VARIABLE_LABELS = {
+    'temp_mean': '平均気温 (℃)',
+    'temp_max': '最高気温 (℃)',
+    'temp_min': '最低気温 (℃)',
+    'hum': '湿度 (%)',
+    'press': '気圧 (hPa)',
+    'precip': '降水量 (mm)',
+    'sun': '日照時間 (h)',
+    'dewpoint': '露点温度 (℃)',
+    'theta_e': '相当温位 (K)',
+    'vpd': '飽和欠差 (Pa)',
+    'wind_u': '東西風 (m/s)',
+    'wind_v': '南北風 (m/s)'
+}
+
+# --- 関数定義 ---
+
+def build_aggregates(df_all):
+    """
+    日付付きのデータベースから、解像度ごとの 平均・最小・最大 を事前に集計する
+    戻り値: {解像度: DataFrame(列は (元の列名, 'mean'/'min'/'max'))}
+    """
+    df = df_all.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.set_index('date').sort_index()
+    df = df.select_dtypes(include='number')
+
+    aggregates = {}
+    for res, params in RESOLUTIONS.items():
+        if res == 'daily':
+            # 日次は元データそのもの（平均=最小=最大）
+            agg = pd.concat({stat: df for stat in ['mean', 'min', 'max']}, axis=1)
+            agg = agg.swaplevel(0, 1, axis=1)
+        else:
+            agg = df.resample(**params).agg(['mean', 'min', 'max'])
+        aggregates[res] = agg.dropna(how='all')
+    return aggregates
+
+def slice_period(agg, start, end, res):
+    """期間 [start, end] に重なる区間を切り出す（start を含む週・月の区間も含める）"""
+    i0 = max(agg.index.searchsorted(start, side='right') - 1, 0)
+    # 直前の区間が start まで届いていない（欠測で間が空いている）場合は含めない
+    if len(agg) and agg.index[i0] + to_offset(RESOLUTIONS[res]['rule']) <= start:
+        i0 += 1
+    i1 = agg.index.searchsorted(end, side='right')
+    return agg.iloc[i0:i1]
+
+def choose_resolution(aggregates, start, end, max_points=MAX_POINTS):
+    """
+    期間内の点数が max_points × COARSEN_FACTOR 以下になる、最も細かい解像度を選ぶ
+    多少の超過は間引きで対応し、大きく超えるときだけ粗い解像度に切り替える
+    """
+    for res in RESOLUTIONS:
+        n = len(slice_period(aggregates[res], start, end, res))
+        if n <= max_points * COARSEN_FACTOR:
+            return res
+    # どの解像度でも多すぎる場合は一番粗いものを使い、後で間引く
+    return list(RESOLUTIONS)[-1]
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 法で、形を保ったまま間引く点のインデックスを返す
+    （山や谷などの特徴的な点を優先して残す）
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # 欠損値は前後の値で埋めて面積計算に使う（元の値は変更しない）
+    y_fill = pd.Series(y).interpolate(limit_direction='both').fillna(0).to_numpy()
+
+    # 最初と最後の点は必ず残し、中間を (n_out - 2) 個のバケツに分割
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0] = 0
+    idx[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 次のバケツの平均点（最後のバケツの次は終点）
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+        else:
+            nlo, nhi = n - 1, n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y_fill[nlo:nhi].mean()
+
+        # 直前に選んだ点・次バケツの平均点と作る三角形の面積が最大の点を選ぶ
+        area = np.abs(
+            (x[a] - avg_x) * (y_fill[lo:hi] - y_fill[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y_fill[a])
+        )
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+def get_series(aggregates, station, variable, start, end, max_points=MAX_POINTS):
+    """
+    指定した地点・変数・期間の系列を、グラフ表示用に整形して返す
+    戻り値: (DataFrame[date, mean, min, max], 使用した解像度)
+    """
+    res = choose_resolution(aggregates, start, end, max_points)
+    col = f'{station}_{variable}'
+    agg = aggregates[res]
+    if col not in agg.columns.get_level_values(0):
+        return pd.DataFrame(columns=['date', 'mean', 'min', 'max']), res
+
+    df = slice_period(agg[col], start, end, res).reset_index()
+    df.columns = ['date', 'mean', 'min', 'max']
+
+    if len(df) > max_points:
+        x = df['date'].map(pd.Timestamp.toordinal).to_numpy()
+        df = df.iloc[lttb_indices(x, df['mean'].to_numpy(), max_points)]
+    return df.reset_index(drop=True), res
@@ -2,10 +2,12 @@ import streamlit as st
 import pandas as pd
 import datetime
 import altair as alt
-from sklearn.ensemble import RandomForestRegressor
 
 # 自作モジュール
 import utils 
+import explorer
+import analog
+import model_store
 
 # --- ページ設定 ---
 st.set_page_config(page_title="Simple Weather AI", page_icon="🌤️")
@@ -18,27 +20,18 @@ tomorrow = today + datetime.timedelta(days=1)
 # --- AIモデル構築 ---
 @st.cache_resource
 def load_smart_model():
+    # 学習済みモデルを読み取り専用でメモリマップする（同じホストのワーカー間で共有）
+    return model_store.load_or_train()
+
+@st.cache_resource
+def load_analog_model():
     df_all = pd.read_csv('weather_database_enhanced.csv')
-    df_all['date'] = pd.to_datetime(df_all['date'])
-    
-    valid_features = []
-    for lag in range(1, 8):
-        for st_name in ['tokyo', 'kofu']:
-            for col in utils.WEATHER_COLS:
-                col_name = f'lag{lag}_{st_name}_{col}'
-                if f'{st_name}_{col}' in df_all.columns:
-                    df_all[col_name] = df_all[f'{st_name}_{col}'].shift(lag)
-                    valid_features.append(col_name)
-    
-    df_ml = df_all.dropna(subset=valid_features).copy()
-    
-    models = {}
-    for target_key, target_col in {'max': 'tokyo_temp_max', 'min': 'tokyo_temp_min'}.items():
-        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
-        model.fit(df_ml[valid_features], df_ml[target_col])
-        models[target_key] = model
+    return analog.load_or_build(df_all)
 
-    return models, valid_features
+@st.cache_resource
+def load_explorer_aggregates():
+    df_all = pd.read_csv('weather_database_enhanced.csv')
+    return explorer.build_aggregates(df_all)
 
 # --- メイン処理 ---
 if st.button('予報を開始'):
@@ -57,15 +50,26 @@ if st.button('予報を開始'):
             recent_actual_data.insert(0, day_results)
 
         # ② 予測実行
-        models, valid_features = load_smart_model()
+        model, valid_features, targets, feature_stations = load_smart_model()
         
         # 今日の予測
-        input_values = utils.build_input_vector(recent_actual_data) 
+        input_values = utils.build_input_vector(recent_actual_data, stations=feature_stations)
         input_today_df = pd.DataFrame([input_values], columns=valid_features)
         
-        preds_today = {}
-        for key in ['max', 'min']:
-            preds_today[key] = models[key].predict(input_today_df)[0]
+        # 全ての予測対象を1回の予測でまとめて求める
+        preds_today = {k: v[0] for k, v in model_store.predict_targets(model, input_today_df, targets).items()}
+
+        # 類似日予報（比較用）
+        # 比較用なので、失敗してもメインの予報は表示する
+        try:
+            analog_model = load_analog_model()
+            # 類似日の索引は全地点の特徴量で作っている
+            preds_analog, analog_dates = analog_model.predict(utils.build_input_vector(recent_actual_data))
+        except Exception as e:
+            preds_analog, analog_dates = None, []
+            analog_error = str(e)
+        else:
+            analog_error = None
 
         # 明日の予測
         predicted_record = {}
@@ -80,86 +84,158 @@ if st.button('予報を開始'):
             }
         
         future_input_list = [predicted_record] + recent_actual_data[:-1]
-        input_tomorrow_values = utils.build_input_vector(future_input_list)
+        input_tomorrow_values = utils.build_input_vector(future_input_list, stations=feature_stations)
         input_tomorrow_df = pd.DataFrame([input_tomorrow_values], columns=valid_features)
         
-        preds_tomorrow = {}
-        for key in ['max', 'min']:
-            preds_tomorrow[key] = models[key].predict(input_tomorrow_df)[0]
+        preds_tomorrow = {k: v[0] for k, v in model_store.predict_targets(model, input_tomorrow_df, targets).items()}
 
         status_text.empty()
 
-        # --- UI表示 ---
-
-        # 昨日のデータを取得（比較用）
-        yesterday_data = recent_actual_data[0]['tokyo']
-
-        # 1. 今日の気温 (前日比を追加)
-        st.subheader(f"今日 {today.strftime('%m/%d')}")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric(
-                "最高気温", 
-                f"{preds_today['max']:.1f}℃", 
-                delta=f"{preds_today['max'] - yesterday_data['temp_max']:.1f}℃"
-            )
-        with col2:
-            st.metric(
-                "最低気温", 
-                f"{preds_today['min']:.1f}℃", 
-                delta=f"{preds_today['min'] - yesterday_data['temp_min']:.1f}℃"
-            )
-
-        # 2. 明日の気温 (今日比)
-        st.subheader(f"明日 {tomorrow.strftime('%m/%d')}")
-        col3, col4 = st.columns(2)
-        with col3:
-            st.metric(
-                "最高気温", 
-                f"{preds_tomorrow['max']:.1f}℃", 
-                delta=f"{preds_tomorrow['max'] - preds_today['max']:.1f}℃"
-            )
-        with col4:
-            st.metric(
-                "最低気温", 
-                f"{preds_tomorrow['min']:.1f}℃", 
-                delta=f"{preds_tomorrow['min'] - preds_today['min']:.1f}℃"
-            )
-
-        # 3. AI解説
-        latest_data = recent_actual_data[0]['tokyo']
-        prev_data = recent_actual_data[1]['tokyo']
-        commentary = utils.generate_commentary(
-            latest_data['theta_e'], prev_data['theta_e'], 
-            preds_tomorrow['max'], preds_today['max']
+        # 結果は session_state に残す
+        # （エクスプローラーの操作でスクリプトが再実行されても、予報の表示が消えないように）
+        st.session_state['forecast'] = {
+            'today': today,
+            'target_dates': target_dates,
+            'recent_actual_data': recent_actual_data,
+            'preds_today': preds_today,
+            'preds_tomorrow': preds_tomorrow,
+            'preds_analog': preds_analog,
+            'analog_dates': analog_dates,
+            'analog_error': analog_error
+        }
+
+    except Exception as e:
+        status_text.empty()
+        st.session_state.pop('forecast', None)
+        st.error(f"エラーが発生しました: {e}")
+
+# 日付が変わったら、前日の予報は表示しない
+forecast = st.session_state.get('forecast')
+if forecast is not None and forecast['today'] == today:
+    target_dates = forecast['target_dates']
+    recent_actual_data = forecast['recent_actual_data']
+    preds_today = forecast['preds_today']
+    preds_tomorrow = forecast['preds_tomorrow']
+    preds_analog = forecast['preds_analog']
+    analog_dates = forecast['analog_dates']
+    analog_error = forecast['analog_error']
+
+    # --- UI表示 ---
+
+    # 昨日のデータを取得（比較用）
+    yesterday_data = recent_actual_data[0]['tokyo']
+
+    # 1. 今日の気温 (前日比を追加)
+    st.subheader(f"今日 {today.strftime('%m/%d')}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(
+            "最高気温", 
+            f"{preds_today['max']:.1f}℃", 
+            delta=f"{preds_today['max'] - yesterday_data['temp_max']:.1f}℃"
+        )
+    with col2:
+        st.metric(
+            "最低気温", 
+            f"{preds_today['min']:.1f}℃", 
+            delta=f"{preds_today['min'] - yesterday_data['temp_min']:.1f}℃"
         )
-        st.markdown("---")
-        st.markdown(f"**🤖 予報の根拠**\n\n{commentary}")
 
-        # 4. 推移グラフ
-        st.markdown("---")
-        st.caption("過去7日間の気温推移")
-        
-        summary = []
-        for i, date in enumerate(target_dates):
-            d = recent_actual_data[i]['tokyo']
-            summary.append({
-                "日付": date.strftime('%m/%d'), 
-                "最高気温": d['temp_max'], 
-                "最低気温": d['temp_min']
-            })
-        df_summary = pd.DataFrame(summary)
-
-        base = alt.Chart(df_summary).encode(x=alt.X('日付', sort=None))
-        line_max = base.mark_line(color='#ff6b6b', point=True).encode(
-            y=alt.Y('最高気温', scale=alt.Scale(zero=False), title='気温 (℃)'),
-            tooltip=['日付', '最高気温']
+    if preds_analog is not None:
+        analog_days = "、".join(d.strftime('%Y/%m/%d') for d in analog_dates[:3])
+        st.caption(
+            f"類似日予報: 最高 {preds_analog['max']:.1f}℃ / 最低 {preds_analog['min']:.1f}℃"
+            f"（よく似た日: {analog_days}）"
         )
-        line_min = base.mark_line(color='#4d96ff', point=True).encode(
-            y=alt.Y('最低気温', scale=alt.Scale(zero=False)),
-            tooltip=['日付', '最低気温']
+    else:
+        st.caption(f"類似日予報は利用できません（{analog_error}）")
+
+    # 2. 明日の気温 (今日比)
+    st.subheader(f"明日 {tomorrow.strftime('%m/%d')}")
+    col3, col4 = st.columns(2)
+    with col3:
+        st.metric(
+            "最高気温", 
+            f"{preds_tomorrow['max']:.1f}℃", 
+            delta=f"{preds_tomorrow['max'] - preds_today['max']:.1f}℃"
+        )
+    with col4:
+        st.metric(
+            "最低気温", 
+            f"{preds_tomorrow['min']:.1f}℃", 
+            delta=f"{preds_tomorrow['min'] - preds_today['min']:.1f}℃"
         )
-        st.altair_chart((line_max + line_min).properties(height=250), use_container_width=True)
 
-    except Exception as e:
-        st.error(f"エラーが発生しました: {e}")
\ No newline at end of file
+    # 3. AI解説
+    latest_data = recent_actual_data[0]['tokyo']
+    prev_data = recent_actual_data[1]['tokyo']
+    commentary = utils.generate_commentary(
+        latest_data['theta_e'], prev_data['theta_e'], 
+        preds_tomorrow['max'], preds_today['max']
+    )
+    st.markdown("---")
+    st.markdown(f"**🤖 予報の根拠**\n\n{commentary}")
+
+    # 4. 推移グラフ
+    st.markdown("---")
+    st.caption("過去7日間の気温推移")
+    
+    summary = []
+    for i, date in enumerate(target_dates):
+        d = recent_actual_data[i]['tokyo']
+        summary.append({
+            "日付": date.strftime('%m/%d'), 
+            "最高気温": d['temp_max'], 
+            "最低気温": d['temp_min']
+        })
+    df_summary = pd.DataFrame(summary)
+
+    base = alt.Chart(df_summary).encode(x=alt.X('日付', sort=None))
+    line_max = base.mark_line(color='#ff6b6b', point=True).encode(
+        y=alt.Y('最高気温', scale=alt.Scale(zero=False), title='気温 (℃)'),
+        tooltip=['日付', '最高気温']
+    )
+    line_min = base.mark_line(color='#4d96ff', point=True).encode(
+        y=alt.Y('最低気温', scale=alt.Scale(zero=False)),
+        tooltip=['日付', '最低気温']
+    )
+    st.altair_chart((line_max + line_min).properties(height=250), use_container_width=True)
+
+# --- 過去データエクスプローラー ---
+st.markdown("---")
+with st.expander("📚 過去データを見る"):
+    aggregates = load_explorer_aggregates()
+    daily_index = aggregates['daily'].index
+    min_date, max_date = daily_index.min().date(), daily_index.max().date()
+
+    col_st, col_var = st.columns(2)
+    with col_st:
+        ex_station = st.selectbox("地点", list(utils.STATIONS.keys()))
+    with col_var:
+        ex_variable = st.selectbox(
+            "項目", utils.WEATHER_COLS,
+            format_func=lambda c: explorer.VARIABLE_LABELS.get(c, c)
+        )
+    ex_range = st.date_input(
+        "期間", value=(max_date - datetime.timedelta(days=365), max_date),
+        min_value=min_date, max_value=max_date
+    )
+
+    if isinstance(ex_range, (list, tuple)) and len(ex_range) == 2:
+        start, end = pd.Timestamp(ex_range[0]), pd.Timestamp(ex_range[1])
+        df_series, res = explorer.get_series(aggregates, ex_station, ex_variable, start, end)
+        label = explorer.VARIABLE_LABELS.get(ex_variable, ex_variable)
+        res_label = {'daily': '日別', 'weekly': '週別', 'monthly': '月別'}[res]
+        st.caption(f"{res_label}表示（{len(df_series)}点）")
+
+        base = alt.Chart(df_series).encode(x=alt.X('date:T', title='日付'))
+        band = base.mark_area(opacity=0.25, color='#4d96ff').encode(
+            y=alt.Y('min:Q', scale=alt.Scale(zero=False), title=label),
+            y2='max:Q'
+        )
+        line = base.mark_line(color='#4d96ff').encode(
+            y=alt.Y('mean:Q', scale=alt.Scale(zero=False)),
+            tooltip=[alt.Tooltip('date:T', title='日付'), alt.Tooltip('mean:Q', title=label, format='.1f')]
+        )
+        chart = line if res == 'daily' else band + line
+        st.altair_chart(chart.properties(height=250), use_container_width=True)
@@ -0,0 +1,238 @@
+import os
+import json
+import shutil
+import time
+import fcntl
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+import utils
+
+# --- 定数設定 ---
+# 学習済みモデルの保存先
+# MODEL_DIR の中に版ごとのフォルダ (.npy を並べたもの) を作り、CURRENT ファイルで使う版を指します
+# .npy は圧縮しないので、読み込み時にメモリマップでき、同じホストのワーカー同士で1つのコピーを共有できます
+MODEL_DIR = 'smart_model'
+POINTER_FILE = 'CURRENT'
+# ワーカー間のロック
+# TRAIN_LOCK: 学習を1つのワーカーだけが行うように / VERSIONS_LOCK: 読み込み中の版を片付けないように
+TRAIN_LOCK = 'train.lock'
+VERSIONS_LOCK = 'versions.lock'
+# 残しておく古い版の数（読み込み途中のワーカーが古い版を開けるように）
+KEEP_VERSIONS = 2
+DATA_PATH = 'weather_database_enhanced.csv'
+
+# 予測対象 {キー: 列名}
+# 1つのモデルでまとめて学習・予測するので、項目を増やしても学習と予測の回数は増えません
+# 例: 'precip': 'tokyo_precip', 'sun': 'tokyo_sun', 'kofu_max': 'kofu_temp_max'
+TARGET_COLS = {'max': 'tokyo_temp_max', 'min': 'tokyo_temp_min'}
+# 特徴量に使う地点（並び順もそのまま入力ベクトルの順になります）
+FEATURE_STATIONS = list(utils.STATIONS.keys())
+
+# 1本の森を表す配列
+FOREST_ARRAYS = ['left', 'right', 'feature', 'threshold', 'missing_left', 'value', 'roots']
+# 保存形式の版（配列の構成を変えたら上げる。違う版のモデルは作り直す）
+FORMAT_VERSION = 2
+
+# --- クラス定義 ---
+
+class FlatForest:
+    """
+    RandomForestRegressor の全ての木を、連結した平らな配列で持つ推論専用モデル
+    sklearn のモデルは読み込み時に木をプロセス内へコピーしてしまうため、
+    配列のまま（メモリマップのまま）たどって予測します
+    """
+
+    def __init__(self, left, right, feature, threshold, missing_left, value, roots, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left  # 欠損値(NaN)を左に送るノードか
+        self.value = value      # (ノード数, 出力数)
+        self.roots = roots      # 各木の根のノード番号
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model):
+        lefts, rights, features, thresholds, missing_lefts, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            idx = np.arange(offset, offset + n)
+            is_leaf = tree.children_left == -1
+            # 葉は自分自身を指すようにして、深さの分だけ一律にたどれるようにする
+            lefts.append(np.where(is_leaf, idx, tree.children_left + offset))
+            rights.append(np.where(is_leaf, idx, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            # 欠損値の行き先は学習時に木ごとに決まっている（古い sklearn にはないので右に送る）
+            missing_lefts.append(getattr(tree, 'missing_go_to_left', np.zeros(n, dtype=np.uint8)))
+            values.append(tree.value[:, :, 0])
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            np.concatenate(lefts).astype(np.int32),
+            np.concatenate(rights).astype(np.int32),
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(missing_lefts).astype(bool),
+            np.concatenate(values).astype(np.float64),
+            np.array(roots, dtype=np.int32),
+            max(est.tree_.max_depth for est in model.estimators_)
+        )
+
+    def predict(self, X):
+        """各木の葉の値の平均（RandomForestRegressor.predict と同じ結果）"""
+        # sklearn と同じく float32 に変換してから閾値と比べる
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            # NaN は比較では常に右に行ってしまうので、sklearn と同じく学習時に決めた向きに送る
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        pred = self.value[node].mean(axis=1)
+        return pred[:, 0] if pred.shape[1] == 1 else pred
+
+    def save(self, path, name):
+        for key in FOREST_ARRAYS:
+            np.save(os.path.join(path, f'{name}_{key}.npy'), getattr(self, key))
+
+    @classmethod
+    def load(cls, path, name, max_depth, mmap_mode='r'):
+        arrays = {
+            key: np.load(os.path.join(path, f'{name}_{key}.npy'), mmap_mode=mmap_mode)
+            for key in FOREST_ARRAYS
+        }
+        return cls(max_depth=max_depth, **arrays)
+
+# --- 関数定義 ---
+
+@contextmanager
+def file_lock(path, name, exclusive=True):
+    """MODEL_DIR 内のロックファイルで、同じホストのワーカー同士を排他する (fcntl.flock)"""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, name), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def train_smart_model(data_path=DATA_PATH, targets=TARGET_COLS, stations=FEATURE_STATIONS):
+    """
+    データベースから、全ての予測対象を同時に出力する1つのRandomForestを学習する
+    戻り値: (モデル, 特徴量名のリスト, 予測対象 {キー: 列名}, 特徴量に使った地点)
+    """
+    df_all = pd.read_csv(data_path)
+    df_all['date'] = pd.to_datetime(df_all['date'])
+
+    df_all, valid_features = utils.build_lag_features(df_all, stations=stations)
+
+    target_cols = list(targets.values())
+    df_ml = df_all.dropna(subset=valid_features + target_cols).copy()
+
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(df_ml[valid_features], df_ml[target_cols])
+
+    return model, valid_features, dict(targets), list(stations)
+
+def predict_targets(model, X, targets):
+    """1回の予測で全ての対象をまとめて求め、{キー: 予測値の配列} で返す"""
+    pred = np.asarray(model.predict(X)).reshape(len(X), -1)
+    return {key: pred[:, i] for i, key in enumerate(targets)}
+
+def save_models(model, valid_features, targets, stations, path=MODEL_DIR):
+    """
+    モデルを新しい版のフォルダに .npy として保存し、CURRENT ファイルを置き換えて切り替える
+    CURRENT は一時ファイルから os.replace で差し替えるので、読み込み中のワーカーは
+    常に古い版か新しい版のどちらか完全なものを見ます
+    """
+    os.makedirs(path, exist_ok=True)
+    version = f'v{time.time_ns()}_{os.getpid()}'
+    version_path = os.path.join(path, version)
+    os.makedirs(version_path)
+
+    forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    forest.save(version_path, 'forest')
+    meta = {
+        'features': list(valid_features),
+        'targets': dict(targets),
+        'stations': list(stations),
+        'format': FORMAT_VERSION,
+        'max_depth': int(forest.max_depth)
+    }
+    with open(os.path.join(version_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # 切り替えと片付けは、読み込み中のワーカーがいない間に行う
+    with file_lock(path, VERSIONS_LOCK):
+        tmp_pointer = os.path.join(path, f'{POINTER_FILE}.{os.getpid()}.tmp')
+        with open(tmp_pointer, 'w') as f:
+            f.write(version)
+        os.replace(tmp_pointer, os.path.join(path, POINTER_FILE))
+
+        # 古い版を片付ける（メモリマップ済みのファイルは削除しても使い続けられます）
+        versions = sorted(
+            (d for d in os.listdir(path)
+             if d.startswith('v') and d[1:].split('_')[0].isdigit() and d != version),
+            key=lambda d: int(d[1:].split('_')[0])
+        )
+        for old in versions[:-KEEP_VERSIONS or None]:
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+def current_version_path(path=MODEL_DIR):
+    """CURRENT が指す版のフォルダ (まだ保存されていなければ None)"""
+    try:
+        with open(os.path.join(path, POINTER_FILE)) as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+def load_models(path=MODEL_DIR, mmap_mode='r'):
+    """
+    保存済みモデルを読み取り専用でメモリマップして読み込む
+    戻り値: (モデル, 特徴量名のリスト, 予測対象 {キー: 列名}, 特徴量に使った地点)
+    入力ベクトルは utils.build_input_vector(..., stations=地点) で作ってください
+    """
+    # CURRENT を読んでからメモリマップし終えるまで、その版が片付けられないようにする
+    with file_lock(path, VERSIONS_LOCK, exclusive=False):
+        version_path = current_version_path(path)
+        if version_path is None:
+            raise FileNotFoundError(f'{path} に保存済みモデルがありません')
+        with open(os.path.join(version_path, 'meta.json')) as f:
+            meta = json.load(f)
+        model = FlatForest.load(version_path, 'forest', meta['max_depth'], mmap_mode=mmap_mode)
+    return model, meta['features'], meta['targets'], meta['stations']
+
+def is_up_to_date(path=MODEL_DIR, data_path=DATA_PATH):
+    """保存済みモデルがデータベースより新しく、予測対象・地点の設定と保存形式も同じか"""
+    version_path = current_version_path(path)
+    meta_path = os.path.join(version_path, 'meta.json') if version_path else ''
+    if not os.path.exists(meta_path) or os.path.getmtime(meta_path) < os.path.getmtime(data_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return (meta.get('targets') == TARGET_COLS and meta.get('stations') == FEATURE_STATIONS
+            and meta.get('format') == FORMAT_VERSION)
+
+def load_or_train(path=MODEL_DIR, data_path=DATA_PATH):
+    """
+    保存済みモデルが最新ならそれを使い、なければ学習して保存する
+    学習はロックを取った1つのワーカーだけが行い、待っていた他のワーカーはその結果を読み込む
+    """
+    if is_up_to_date(path, data_path):
+        return load_models(path)
+
+    with file_lock(path, TRAIN_LOCK):
+        # ロックを待っている間に他のワーカーが学習し終えていれば、それを使う
+        if not is_up_to_date(path, data_path):
+            model, valid_features, targets, stations = train_smart_model(data_path)
+            save_models(model, valid_features, targets, stations, path)
+    return load_models(path)
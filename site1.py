@@ -67,25 +67,18 @@ for col in df_combined.columns:
 
 df_ml = df_combined.dropna()
 
-# --- 4. 2つのモデルを学習・保存 ---
+# --- 4. モデルを学習・保存 ---
 # 予測に使うヒント（昨日のデータ）
 features = [col for col in df_ml.columns if 'prev_' in col]
 X = df_ml[features]
 
-# A. 最高気温モデル
-y_max = df_ml['tokyo_temp_max']
-model_max = LinearRegression()
-model_max.fit(X, y_max)
-with open('model_max.pkl', 'wb') as f:
-    pickle.dump(model_max, f)
-print(f"\n✅ 最高気温モデル保存完了 (R2: {model_max.score(X, y_max):.4f})")
+# 最高・最低気温を1つのモデルでまとめて学習（1回の予測で両方が返ります）
+target_cols = {'max': 'tokyo_temp_max', 'min': 'tokyo_temp_min'}
+Y = df_ml[list(target_cols.values())]
+model = LinearRegression()
+model.fit(X, Y)
+with open('model_multi.pkl', 'wb') as f:
+    pickle.dump({'model': model, 'features': features, 'targets': target_cols}, f)
+print(f"\n✅ 気温モデル保存完了 (R2: {model.score(X, Y):.4f})")
 
-# B. 最低気温モデル
-y_min = df_ml['tokyo_temp_min']
-model_min = LinearRegression()
-model_min.fit(X, y_min)
-with open('model_min.pkl', 'wb') as f:
-    pickle.dump(model_min, f)
-print(f"✅ 最低気温モデル保存完了 (R2: {model_min.score(X, y_min):.4f})")
-
-print("\n✨ すべての工程が完了しました。フォルダ内に2つの .pkl ファイルがあることを確認してください。")
\ No newline at end of file
+print("\n✨ すべての工程が完了しました。フォルダ内に model_multi.pkl があることを確認してください。")
\ No newline at end of file
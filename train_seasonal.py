@@ -24,12 +24,12 @@ for st in stations:
 df_ml = df_seasonal.dropna()
 
 # 4. 学習と保存 (これでモデルが14項目を覚えます)
+# 予測対象をまとめて1つのモデルで学習します（項目を増やしても学習は1回）
 target_cols = {'max': 'tokyo_temp_max', 'min': 'tokyo_temp_min'}
 
-for key, t_col in target_cols.items():
-    X = df_ml[features]
-    y = df_ml[t_col]
-    model = LinearRegression().fit(X, y)
-    with open(f'model_{key}.pkl', 'wb') as f:
-        pickle.dump(model, f)
-    print(f"✅ {key}気温予測モデル（冬版・14項目）完成！")
\ No newline at end of file
+X = df_ml[features]
+Y = df_ml[list(target_cols.values())]
+model = LinearRegression().fit(X, Y)
+with open('model_multi.pkl', 'wb') as f:
+    pickle.dump({'model': model, 'features': features, 'targets': target_cols}, f)
+print(f"✅ {'・'.join(target_cols)}気温予測モデル（冬版・14項目）完成！")
@@ -1,3 +1,4 @@
+import time
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
@@ -24,6 +25,20 @@ WEATHER_COLS = [
     'wind_v'    # 追加: 南北風
 ]
 
+# 気象庁 日別値ページ(daily_s1)の列の並び
+DAILY_S1_COLS = [
+    'day',
+    'press_local', 'press_sea',                     # 気圧 (現地・海面の平均)
+    'precip_total', 'precip_1h_max', 'precip_10m_max',
+    'temp_mean', 'temp_max', 'temp_min',
+    'hum_mean', 'hum_min',
+    'wind_mean', 'wind_max', 'wind_max_dir', 'gust_max', 'gust_max_dir',
+    'wind_most_dir',                                # 最多風向（文字）
+    'sun',                                          # 日照時間
+    'snow_total', 'snow_depth_max',
+    'weather_day', 'weather_night'
+]
+
 # 日本時間設定
 JST = timezone(timedelta(hours=+9), 'JST')
 
@@ -42,80 +57,173 @@ def get_wind_degrees(dir_str):
     """気象庁の風向テキスト(漢字)を角度(度)に変換"""
     return WIND_DIR_MAP.get(dir_str, np.nan)
 
+def fetch_hourly_table(date, prec_no, block_no):
+    """気象庁の1日分の時別値ページ(hourly_s1)を取得し、表をそのまま返す"""
+    url = f"https://www.data.jma.go.jp/obd/stats/etrn/view/hourly_s1.php?prec_no={prec_no}&block_no={block_no}&year={date.year}&month={date.month}&day={date.day}&view="
+    
+    r = requests.get(url, timeout=10)
+    r.encoding = r.apparent_encoding
+    soup = BeautifulSoup(r.text, 'html.parser')
+    rows = soup.find_all('tr', class_='mtx')
+    
+    data = []
+    for row in rows[2:]:
+        cols = row.find_all('td')
+        data.append([col.text.strip() for col in cols])
+        
+    df = pd.DataFrame(data)
+    
+    # 数値変換 (エラー値などはNaNへ)
+    # 2:気圧, 3:降水, 4:気温, 7:湿度, 8:風速, 10:日照
+    for col_idx in [2, 3, 4, 7, 8, 10]:
+        df[col_idx] = pd.to_numeric(df[col_idx], errors='coerce')
+    return df
+
+def calc_thermo(t_mean, hum_mean, press_mean):
+    """日平均の気温・湿度・気圧から、MetPyで露点・相当温位・飽和欠差を計算する"""
+    t_obj = t_mean * units.degC
+    rh_obj = (hum_mean / 100.0)
+    p_obj = press_mean * units.hPa
+    
+    # 1. 露点 & 相当温位
+    dewpoint_obj = mpcalc.dewpoint_from_relative_humidity(t_obj, rh_obj)
+    theta_e_obj = mpcalc.equivalent_potential_temperature(p_obj, t_obj, dewpoint_obj)
+
+    # 2. 飽和欠差 (VPD)
+    e_sat_dew = mpcalc.saturation_vapor_pressure(dewpoint_obj)
+    e_sat_temp = mpcalc.saturation_vapor_pressure(t_obj)
+    vpd_obj = e_sat_temp - e_sat_dew
+
+    return {
+        'dewpoint': dewpoint_obj.magnitude,
+        'theta_e': theta_e_obj.magnitude,
+        'vpd': vpd_obj.magnitude
+    }
+
+def calc_wind_means(df):
+    """時別値の表から、風ベクトル(東西・南北成分)の日平均を計算する"""
+    wind_speeds = df[8].values * units('m/s')
+    wind_dirs = df[9].apply(get_wind_degrees).values * units.deg
+    u_comp, v_comp = mpcalc.wind_components(wind_speeds, wind_dirs)
+    
+    return {
+        'wind_u': np.nanmean(u_comp.magnitude),
+        'wind_v': np.nanmean(v_comp.magnitude)
+    }
+
 def fetch_daily_data(date, prec_no, block_no):
     """
     今日や昨日のデータを取得し、MetPyで物理量(VPD, 風ベクトル等)を計算する
     """
-    url = f"https://www.data.jma.go.jp/obd/stats/etrn/view/hourly_s1.php?prec_no={prec_no}&block_no={block_no}&year={date.year}&month={date.month}&day={date.day}&view="
-    
     try:
-        r = requests.get(url, timeout=10)
-        r.encoding = r.apparent_encoding
-        soup = BeautifulSoup(r.text, 'html.parser')
-        rows = soup.find_all('tr', class_='mtx')
-        
-        data = []
-        for row in rows[2:]:
-            cols = row.find_all('td')
-            data.append([col.text.strip() for col in cols])
-            
-        df = pd.DataFrame(data)
-        
-        # 数値変換 (エラー値などはNaNへ)
-        # 2:気圧, 3:降水, 4:気温, 7:湿度, 8:風速, 10:日照
-        for col_idx in [2, 3, 4, 7, 8, 10]:
-            df[col_idx] = pd.to_numeric(df[col_idx], errors='coerce')
+        df = fetch_hourly_table(date, prec_no, block_no)
 
         # --- 基本統計 ---
         t_mean = df[4].mean()
         hum_mean = df[7].mean()
         press_mean = df[2].mean()
         
-        # --- 高度な物理量計算 (MetPy) ---
-        t_obj = t_mean * units.degC
-        rh_obj = (hum_mean / 100.0)
-        p_obj = press_mean * units.hPa
-        
-        # 1. 露点 & 相当温位
-        dewpoint_obj = mpcalc.dewpoint_from_relative_humidity(t_obj, rh_obj)
-        theta_e_obj = mpcalc.equivalent_potential_temperature(p_obj, t_obj, dewpoint_obj)
-
-        # 2. 飽和欠差 (VPD)
-        e_sat_dew = mpcalc.saturation_vapor_pressure(dewpoint_obj)
-        e_sat_temp = mpcalc.saturation_vapor_pressure(t_obj)
-        vpd_obj = e_sat_temp - e_sat_dew
-
-        # 3. 風ベクトル
-        wind_speeds = df[8].values * units('m/s')
-        wind_dirs = df[9].apply(get_wind_degrees).values * units.deg
-        u_comp, v_comp = mpcalc.wind_components(wind_speeds, wind_dirs)
-        
-        u_mean = np.nanmean(u_comp.magnitude)
-        v_mean = np.nanmean(v_comp.magnitude)
-
-        return {
+        result = {
             'temp_mean': t_mean,
             'temp_max': df[4].max(),
             'temp_min': df[4].min(),
             'hum': hum_mean,
             'press': press_mean,
             'precip': df[3].fillna(0).sum(),
-            'sun': df[10].fillna(0).sum(),
-            'dewpoint': dewpoint_obj.magnitude,
-            'theta_e': theta_e_obj.magnitude,
-            'vpd': vpd_obj.magnitude, # ここも忘れずに！
-            'wind_u': u_mean,
-            'wind_v': v_mean
+            'sun': df[10].fillna(0).sum()
         }
+        # --- 高度な物理量計算 (MetPy) ---
+        result.update(calc_thermo(t_mean, hum_mean, press_mean))
+        result.update(calc_wind_means(df))
+        return result
         
     except Exception:
         return None
 
-def build_input_vector(data_list):
+def fetch_monthly_data(year, month, prec_no, block_no):
+    """
+    気象庁の日別値ページ(daily_s1)から1か月分を1回のリクエストで取得する
+    気温・湿度・気圧・降水・日照と、そこから計算できる物理量(露点・相当温位・VPD)を返す
+    風ベクトルは時別値が必要なため含まない
+    ※ 最高・最低気温は日中の極値で、fetch_daily_data (毎正時の値の最大・最小) とは定義が異なります
+    """
+    url = f"https://www.data.jma.go.jp/obd/stats/etrn/view/daily_s1.php?prec_no={prec_no}&block_no={block_no}&year={year}&month={month}&day=&view="
+
+    try:
+        r = requests.get(url, timeout=10)
+        r.encoding = r.apparent_encoding
+        soup = BeautifulSoup(r.text, 'html.parser')
+        rows = soup.find_all('tr', class_='mtx')
+
+        data = []
+        for row in rows:
+            cols = [col.text.strip() for col in row.find_all('td')]
+            # ヘッダー行(tdなし)や日付のない行は飛ばす
+            if cols and cols[0].isdigit():
+                data.append(cols)
+
+        # 列数が足りない行は空欄で埋めて、列名を付ける
+        n_cols = len(DAILY_S1_COLS)
+        df = pd.DataFrame(
+            [(cols + [''] * n_cols)[:n_cols] for cols in data], columns=DAILY_S1_COLS
+        )
+
+        # 品質記号 ")" "]" を外して数値化 ("--" は現象なし = 0)
+        numeric_cols = ['press_sea', 'precip_total', 'temp_mean', 'temp_max', 'temp_min', 'hum_mean', 'sun']
+        for col in numeric_cols:
+            values = df[col].str.rstrip(')] ').replace('--', '0')
+            df[col] = pd.to_numeric(values, errors='coerce')
+
+        result = pd.DataFrame({
+            'date': [pd.Timestamp(year, month, int(d)).date() for d in df['day']],
+            'temp_mean': df['temp_mean'],
+            'temp_max': df['temp_max'],
+            'temp_min': df['temp_min'],
+            'hum': df['hum_mean'],
+            'press': df['press_sea'],
+            'precip': df['precip_total'],
+            'sun': df['sun']
+        })
+        # 物理量は日平均値からまとめて計算
+        thermo = calc_thermo(df['temp_mean'].values, df['hum_mean'].values, df['press_sea'].values)
+        for key, val in thermo.items():
+            result[key] = val
+        return result
+
+    except Exception:
+        return pd.DataFrame()
+
+def fetch_monthly_data_with_retry(year, month, prec_no, block_no, retries=3):
+    """fetch_monthly_data を、失敗したら間隔を空けて再試行する（それでも失敗したら空のDataFrame）"""
+    for attempt in range(retries):
+        df = fetch_monthly_data(year, month, prec_no, block_no)
+        if not df.empty:
+            return df
+        time.sleep(2 ** attempt)
+    return pd.DataFrame()
+
+def build_lag_features(df_all, max_lag=7, stations=None):
+    """
+    データベースに過去7日分のラグ列 (lag1_tokyo_temp_max 等) を追加する
+    列の並びは build_input_vector と同じ (日 → 地点 → 項目)
+    """
+    stations = stations or list(STATIONS.keys())
+    valid_features = []
+    for lag in range(1, max_lag + 1):
+        for st_name in stations:
+            for col in WEATHER_COLS:
+                col_name = f'lag{lag}_{st_name}_{col}'
+                if f'{st_name}_{col}' in df_all.columns:
+                    df_all[col_name] = df_all[f'{st_name}_{col}'].shift(lag)
+                    valid_features.append(col_name)
+    return df_all, valid_features
+
+def build_input_vector(data_list, stations=None):
     """リストデータをAI入力用の1行のベクトルに変換する"""
+    stations = stations or list(STATIONS.keys())
     v = []
     for day in data_list:
-        for st_name in ['tokyo', 'kofu']:
+        for st_name in stations:
             d = day[st_name]
             # 定義された全カラムを順番に抽出
             for col in WEATHER_COLS: